@@ -7,6 +7,9 @@ import datetime
 # Serial Port Configuration
 SERIAL_PORT = '/dev/cu.usbserial-10'  # serial port used for this project (IOS)
 BAUD_RATE = 115200    # ESP32's baud rate
+# Set True if the firmware streams raw little-endian int16 samples instead of
+# text lines: halves the bytes on the wire and decodes as one bulk cast
+SERIAL_BINARY_MODE = False
 DATA_COLLECTION_DURATION_MINUTES = 1 # Duration to collect data from serial port
 
 # ECG Processing Configuration
@@ -1,5 +1,7 @@
 # data_acquisition.py
 
+import sys
+
 import serial
 import time
 import numpy as np
@@ -9,62 +11,134 @@ def collect_serial_data():
     """
     Collects data from the serial port for a specified duration.
     Assumes data is sent as one numerical value per line.
+    Timestamps and ECG values are kept in two separate contiguous arrays
+    (structure-of-arrays), so downstream filtering streams pure ECG samples
+    without interleaved timestamps sharing its cache lines.
     Returns collected timestamps and ECG values as NumPy arrays.
     Returns (None, None, None) on failure.
     """
-    collected_data = [] # Temporarily stores [timestamp, ecg_value]
+    # Preallocate sample buffers sized for the expected number of samples plus
+    # 25% headroom, so the hot loop is just two array stores per sample instead
+    # of a Python list append (which allocates a list + floats for every sample).
+    expected_samples = int(config.DATA_COLLECTION_DURATION_MINUTES * 60 * config.SAMPLING_RATE_HZ * 1.25)
+    expected_samples = max(expected_samples, 1)
+    timestamp_buffer = np.empty(expected_samples, dtype=np.float64)
+    ecg_buffer = np.empty(expected_samples, dtype=np.float32) # 12-bit ADC values fit comfortably in float32
     sample_count = 0
 
     print(f"Attempting to connect to serial port {config.SERIAL_PORT} at {config.BAUD_RATE} baud...")
     try:
-        with serial.Serial(config.SERIAL_PORT, config.BAUD_RATE, timeout=1) as ser:
+        # A short timeout lets ser.read() block briefly instead of busy-polling
+        with serial.Serial(config.SERIAL_PORT, config.BAUD_RATE, timeout=0.01) as ser:
             print(f"Successfully connected to {config.SERIAL_PORT}. Collecting data for {config.DATA_COLLECTION_DURATION_MINUTES} minutes...")
 
             # Give some time for the serial connection to stabilise
             time.sleep(2)
             ser.flushInput() # Clear any old data in the buffer
 
-            collection_start_time = time.time()
-            end_collection_time = collection_start_time + (config.DATA_COLLECTION_DURATION_MINUTES * 60)
+            # Monotonic integer clock for the deadline: immune to NTP/wall-clock
+            # jumps, and the termination check is a plain integer compare
+            collection_start_ns = time.monotonic_ns()
+            end_collection_ns = collection_start_ns + int(config.DATA_COLLECTION_DURATION_MINUTES * 60 * 1_000_000_000)
+
+            pending = bytearray() # Holds a partial line carried over between reads
+            sample_period = 1.0 / config.SAMPLING_RATE_HZ
+            # Timestamps come from the sample index on the nominal rate grid;
+            # time_offset is nudged towards the wall clock once per chunk to
+            # absorb sensor clock drift without timing each sample
+            time_offset = 0.0
+            # Progress goes to a single rewritten terminal line every 1024
+            # samples; a full print() per second adds formatting plus a
+            # variable-latency newline flush to the acquisition loop
+            next_progress_count = 1024
+
+            while (time.monotonic_ns() < end_collection_ns):
+                try:
+                    # Drain everything the OS has buffered in one read; if nothing
+                    # is waiting, block for at most the port timeout on one byte
+                    chunk = ser.read(ser.in_waiting or 1)
+                except serial.SerialException as e:
+                    print(f"Serial read error: {e}")
+                    break # Exit loop on serial error
+
+                if not chunk:
+                    continue # Read timed out with no data
+
+                pending.extend(chunk)
+
+                if config.SERIAL_BINARY_MODE:
+                    # Raw little-endian int16 samples: keep any trailing odd
+                    # byte and bulk-decode the rest with a single SIMD cast
+                    usable = len(pending) - (len(pending) % 2)
+                    if usable == 0:
+                        continue
+                    ecg_chunk = np.frombuffer(bytes(pending[:usable]), dtype='<i2').astype(np.float32)
+                    del pending[:usable]
+                else:
+                    if b'\n' not in chunk:
+                        continue # No complete line yet
+
+                    # Split off the trailing partial line, then convert all complete
+                    # lines in one vectorised pass instead of float() per sample
+                    complete, _, remainder = bytes(pending).rpartition(b'\n')
+                    pending = bytearray(remainder)
+                    tokens = complete.split() # Splits on \r\n/\n/whitespace, drops empties
+                    if not tokens:
+                        continue
 
-            while (time.time() < end_collection_time):
-                if ser.in_waiting > 0:
                     try:
-                        line_bytes = ser.readline()
-                        # Use errors='ignore' to handle potential non-UTF-8 bytes
-                        line = line_bytes.decode('utf-8', errors='ignore').strip()
-
-                        if line: # Ensure line is not empty
+                        ecg_chunk = np.array(tokens, dtype=np.float32)
+                    except ValueError:
+                        # A corrupt token in the chunk: fall back to per-line parsing
+                        # so one bad line does not discard the whole chunk
+                        good_values = []
+                        for token in tokens:
                             try:
-                                ecg_value = float(line)
-                                # Generate a timestamp relative to the start of collection
-                                current_timestamp = (time.time() - collection_start_time)
-                                collected_data.append([current_timestamp, ecg_value])
-                                sample_count += 1
-
-                                if sample_count % config.SAMPLING_RATE_HZ == 0: # Print progress every second (approx)
-                                    print(f"Collected {sample_count} samples... Time elapsed: {current_timestamp:.2f}s")
-
+                                good_values.append(float(token))
                             except ValueError:
-                                print(f"Warning: Could not convert data to float: '{line}'. Skipping.")
-
-                    except UnicodeDecodeError:
-                        print(f"Warning: Unicode decode error. Skipping line.")
-                    except serial.SerialException as e:
-                        print(f"Serial read error: {e}")
-                        break # Exit loop on serial error
-                # Small delay to prevent busy-waiting, adjust if necessary
-                time.sleep(0.001) # Sleep for a fraction of sample interval
-
-        print(f"Data collection complete. Total samples collected: {len(collected_data)}")
-
-        if not collected_data:
+                                print(f"Warning: Could not convert data to float: '{token.decode('utf-8', errors='ignore')}'. Skipping.")
+                        if not good_values:
+                            continue
+                        ecg_chunk = np.array(good_values, dtype=np.float32)
+
+                # Grow the buffers if the sensor ran faster than expected
+                new_count = sample_count + len(ecg_chunk)
+                while new_count > len(ecg_buffer):
+                    timestamp_buffer = np.resize(timestamp_buffer, len(timestamp_buffer) * 2)
+                    ecg_buffer = np.resize(ecg_buffer, len(ecg_buffer) * 2)
+
+                # Timestamps are analytic: sample index times the nominal period,
+                # plus the slowly-adjusted offset. One time.time() call per chunk
+                # (for drift and progress) replaces one per sample.
+                timestamp_buffer[sample_count:new_count] = time_offset + \
+                    np.arange(sample_count, new_count) * sample_period
+                ecg_buffer[sample_count:new_count] = ecg_chunk
+                sample_count = new_count
+
+                # Low-gain resync: pull the grid a tenth of the way towards the
+                # observed wall-clock elapsed, filtering out buffering jitter
+                current_timestamp = (time.monotonic_ns() - collection_start_ns) / 1e9
+                drift = current_timestamp - (time_offset + sample_count * sample_period)
+                time_offset += 0.1 * drift
+
+                if sample_count >= next_progress_count:
+                    sys.stdout.write(f"\rCollected {sample_count} samples... Time elapsed: {current_timestamp:.2f}s")
+                    sys.stdout.flush()
+                    next_progress_count = (sample_count // 1024 + 1) * 1024
+
+        sys.stdout.write("\n") # Finish the in-place progress line
+
+        print(f"Data collection complete. Total samples collected: {sample_count}")
+
+        if sample_count == 0:
             print("No data was collected. Please check your ESP32 connection and data transmission.")
             return None, None, None # Return None for data and duration on failure
 
-        # Separate timestamps and ECG values
-        timestamps = np.array([d[0] for d in collected_data])
-        ecg_values = np.array([d[1] for d in collected_data])
+        # Trim the preallocated buffers down to the samples actually collected.
+        # These slices are zero-copy, contiguous views straight into the
+        # acquisition buffers, so no per-element split or copy happens here
+        timestamps = timestamp_buffer[:sample_count]
+        ecg_values = ecg_buffer[:sample_count]
 
         # Calculate actual duration from collected data timestamps
         actual_duration_seconds = timestamps[-1] if len(timestamps) > 0 else 0